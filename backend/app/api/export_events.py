@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from app.models.db import get_export_task_aoi_ids
+
+# Export task descriptions are built as AOI_<id>_export_<timestamp> in export_aoi_to_asset,
+# or AOI_<first id>_group<count>_export_<timestamp> for consolidated exports. Covered AOIs
+# are read from export_asset_aois; the description is only a fallback for unrecorded tasks
+AOI_DESCRIPTION_PATTERN = re.compile(r'^AOI_(\d+)_(?:group\d+_)?export_')
+
+ACTIVE_STATES = ('UNSUBMITTED', 'READY', 'RUNNING', 'CANCEL_REQUESTED')
+
+
+class Subscriber:
+    """A connected event stream client, optionally filtered by task or AOI."""
+
+    def __init__(self, task_id=None, aoi_id=None, max_queue=100):
+        self.task_id = task_id
+        self.aoi_id = aoi_id
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def matches(self, event):
+        if self.task_id is not None and event['task_id'] != self.task_id:
+            return False
+        if self.aoi_id is not None and self.aoi_id not in event['aoi_ids']:
+            return False
+        return True
+
+
+class ExportEventBroker:
+    """
+    Observes GEE export tasks with a single shared poller and fans state
+    transitions out to any number of subscribers.
+
+    The poller thread only runs while at least one subscriber is connected,
+    and subscribers never add upstream calls. Each open stream does still
+    hold a server worker thread while it waits on its queue (the app runs on
+    threaded WSGI servers), so concurrent subscribers are capped at
+    max_subscribers.
+    """
+
+    def __init__(self, poll_interval=5.0, max_subscribers=20):
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._tasks = {}
+        # Tasks whose covered AOIs no longer need a database lookup
+        self._resolved = set()
+        self._last_poll = None
+        self._event_id = 0
+        self._thread = None
+        self._baseline_done = False
+
+    def subscribe(self, task_id=None, aoi_id=None):
+        """
+        Register a subscriber and start the poller if it is not running.
+        Returns None when max_subscribers streams are already open.
+        """
+        subscriber = Subscriber(task_id=task_id, aoi_id=aoi_id)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='export-event-poller', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def snapshot(self, subscriber):
+        """Current known state of the tasks a subscriber is interested in."""
+        with self._lock:
+            tasks = list(self._tasks.values())
+        if subscriber.task_id is None and subscriber.aoi_id is None:
+            tasks = [t for t in tasks if t['state'] in ACTIVE_STATES]
+        return [t for t in tasks if subscriber.matches(t)]
+
+    def get_cached_state(self, task_id, max_age=None):
+        """Return the last observed task state if it is fresher than max_age seconds."""
+        max_age = self.poll_interval if max_age is None else max_age
+        with self._lock:
+            if self._last_poll is None or time.monotonic() - self._last_poll > max_age:
+                return None
+            task = self._tasks.get(task_id)
+            return task['state'] if task else None
+
+    def next_event_id(self):
+        with self._lock:
+            self._event_id += 1
+            return self._event_id
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                import ee
+                self.observe(ee.data.getTaskList())
+            except Exception as e:
+                print(f"Export event poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def observe(self, task_list):
+        """Record a task list observation and publish any state transitions."""
+        with self._lock:
+            new_task_ids = [t.get('id') for t in task_list if t.get('id') and t.get('id') not in self._resolved]
+        # Look up covered AOIs once per task, outside the lock
+        covered = (get_export_task_aoi_ids(new_task_ids) or {}) if new_task_ids else {}
+
+        events = []
+        with self._lock:
+            for task in task_list:
+                task_id = task.get('id')
+                if not task_id:
+                    continue
+                previous = self._tasks.get(task_id)
+                if task_id in covered:
+                    aoi_ids = covered[task_id]
+                    self._resolved.add(task_id)
+                elif previous is not None:
+                    aoi_ids = previous['aoi_ids']
+                else:
+                    match = AOI_DESCRIPTION_PATTERN.match(task.get('description') or '')
+                    aoi_ids = [int(match.group(1))] if match else []
+                # The asset may be recorded just after the task starts; keep looking while it runs
+                if task.get('state') not in ACTIVE_STATES:
+                    self._resolved.add(task_id)
+                if previous is not None and previous['state'] == task.get('state'):
+                    if previous['aoi_ids'] != aoi_ids:
+                        previous['aoi_ids'] = aoi_ids
+                        previous['aoi_id'] = aoi_ids[0] if aoi_ids else None
+                    continue
+                event = {
+                    'task_id': task_id,
+                    'aoi_id': aoi_ids[0] if aoi_ids else None,
+                    'aoi_ids': aoi_ids,
+                    'state': task.get('state'),
+                    'previous_state': previous['state'] if previous else None,
+                    'description': task.get('description'),
+                    'error_message': task.get('error_message'),
+                    'observed_at': datetime.now().isoformat()
+                }
+                self._tasks[task_id] = event
+                # On the first observation, tasks that already finished are only news to
+                # subscribers filtered to them; the unfiltered stream follows active tasks
+                baseline = not self._baseline_done and event['state'] not in ACTIVE_STATES
+                events.append((event, baseline))
+            self._baseline_done = True
+            self._last_poll = time.monotonic()
+            subscribers = list(self._subscribers)
+
+        for event, baseline in events:
+            for subscriber in subscribers:
+                if subscriber.overflowed or not subscriber.matches(event):
+                    continue
+                if baseline and subscriber.task_id is None and subscriber.aoi_id is None:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    # Drop slow clients; they will reconnect and receive a fresh snapshot
+                    subscriber.overflowed = True
+
+
+def format_sse(data, event=None, event_id=None):
+    """Format a payload as a Server-Sent Events message."""
+    message = ''
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    if event is not None:
+        message += f'event: {event}\n'
+    message += f'data: {json.dumps(data)}\n\n'
+    return message
+
+
+broker = ExportEventBroker(
+    poll_interval=float(os.getenv('EXPORT_EVENTS_POLL_SECONDS', '5')),
+    max_subscribers=int(os.getenv('EXPORT_EVENTS_MAX_SUBSCRIBERS', '20'))
+)
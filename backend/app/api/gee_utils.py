@@ -1,13 +1,15 @@
-import ee
 import os
 import json
 import time
-from app.models.db import get_aoi
+from app.models.db import get_aoi, get_aoi_overlap_clusters, record_export_asset, get_simplified_aoi_geometry
 from flask import current_app
 from datetime import datetime, timedelta
 
 def initialize_gee(max_retries=3, delay=1):
     """Initialize Google Earth Engine using service account with retry logic"""
+    # Imported on first GEE use; loading the client is a large share of app startup
+    import ee
+
     for attempt in range(max_retries):
         try:
             # Get paths from environment
@@ -56,6 +58,76 @@ def get_time_range(preset_id=None):
     start_date = end_date - timedelta(days=days_back)
     return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
 
+# Export resolution in meters per pixel
+EXPORT_SCALE = 30
+
+# Geometry sent to GEE is simplified by this fraction of the export scale
+SIMPLIFY_TOLERANCE_FACTOR = 0.5
+
+def resolve_export_params(params=None):
+    """Fill in export parameter defaults and resolve the time range"""
+    params = params or {}
+
+    # Get time range from preset or parameters
+    if params.get('start_date') and params.get('end_date'):
+        start_date = params['start_date']
+        end_date = params['end_date']
+    else:
+        start_date, end_date = get_time_range(params.get('preset_id'))
+
+    scale = float(params.get('scale') or EXPORT_SCALE)
+    if scale <= 0:
+        raise ValueError("scale must be a positive number of meters")
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "polarization": params.get('polarization', ['VV', 'VH']),
+        "orbit": params.get('orbit', 'ASCENDING'),
+        "preset_id": params.get('preset_id'),
+        "scale": scale
+    }
+
+def start_sentinel1_export(geom_dict, name, export_params):
+    """
+    Starts a Sentinel-1 asset export clipped to a GeoJSON geometry.
+    name prefixes the task description and asset id (e.g. AOI_5).
+    Returns (task_id, asset_id), or None if no images match.
+    """
+    import ee
+
+    # Convert PostGIS geometry to GEE geometry
+    geometry = ee.Geometry(geom_dict)
+
+    # Get Sentinel-1 collection
+    collection = ee.ImageCollection('COPERNICUS/S1_GRD') \
+        .filterBounds(geometry) \
+        .filterDate(export_params['start_date'], export_params['end_date']) \
+        .filter(ee.Filter.eq('orbitProperties_pass', export_params['orbit'])) \
+        .select(export_params['polarization'])
+
+    if collection.size().getInfo() == 0:
+        return None
+
+    # Get the first image and clip to AOI
+    image = collection.first().clip(geometry)
+
+    # Set up export task
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    asset_id = f"projects/{os.getenv('GEE_PROJECT')}/assets/{name}_export_{timestamp}"
+    task = ee.batch.Export.image.toAsset(
+        image=image,
+        description=f'{name}_export_{timestamp}',
+        assetId=asset_id,
+        scale=export_params['scale'],
+        region=geometry,
+        maxPixels=1e13
+    )
+
+    # Start the task
+    task.start()
+    return task.id, asset_id
+
 def export_aoi_to_asset(aoi_id, params=None):
     """
     Creates a GEE export task for a given AOI ID
@@ -73,68 +145,130 @@ def export_aoi_to_asset(aoi_id, params=None):
         if not aoi_data:
             return {"status": "error", "message": "AOI not found"}
 
-        # Set default parameters
-        params = params or {}
-        polarization = params.get('polarization', ['VV', 'VH'])
-        orbit = params.get('orbit', 'ASCENDING')
-        
-        # Get time range from preset or parameters
-        if params.get('start_date') and params.get('end_date'):
-            start_date = params['start_date']
-            end_date = params['end_date']
+        export_params = resolve_export_params(params)
+
+        # Simplify with a tolerance below the pixel size; falls back to the stored geometry
+        tolerance_m = export_params['scale'] * SIMPLIFY_TOLERANCE_FACTOR
+        simplified = get_simplified_aoi_geometry(aoi_id, export_params['scale'], tolerance_m)
+        if simplified:
+            geometry = simplified['geometry']
+            vertices = {
+                "before": simplified['vertices_before'],
+                "after": simplified['vertices_after'],
+                "tolerance_m": tolerance_m,
+                "cached": simplified['cached']
+            }
         else:
-            start_date, end_date = get_time_range(params.get('preset_id'))
+            geometry = aoi_data['geometry']
+            vertices = None
 
-        # Convert PostGIS geometry to GEE geometry
-        geom_dict = json.loads(aoi_data['geometry'])
-        geometry = ee.Geometry(geom_dict)
+        started = start_sentinel1_export(json.loads(geometry), f'AOI_{aoi_id}', export_params)
+        if started is None:
+            return {"status": "error", "message": "No images found for this AOI with specified parameters"}
+        task_id, asset_id = started
+        record_export_asset(task_id, asset_id, [aoi_id], export_params)
 
-        # Get Sentinel-1 collection
-        collection = ee.ImageCollection('COPERNICUS/S1_GRD') \
-            .filterBounds(geometry) \
-            .filterDate(start_date, end_date) \
-            .filter(ee.Filter.eq('orbitProperties_pass', orbit)) \
-            .select(polarization)
+        return {
+            "status": "success",
+            "message": "Export task started",
+            "task_id": task_id,
+            "asset_id": asset_id,
+            "parameters": export_params,
+            "vertices": vertices
+        }
 
-        if collection.size().getInfo() == 0:
-            return {"status": "error", "message": "No images found for this AOI with specified parameters"}
+    except Exception as e:
+        return {"status": "error", "message": f"Export failed: {str(e)}"}
+
+def export_aois_consolidated(aoi_ids, params=None):
+    """
+    Exports a set of AOIs with identical parameters, merging overlapping or
+    duplicate AOIs so each shared pixel is exported once.
+    AOIs are grouped into clusters of intersecting geometries in PostGIS;
+    each cluster's union is exported as a single asset, and the AOIs it
+    covers are recorded in export_asset_aois.
+    Returns the started exports and a report of pixels saved.
+    """
+    try:
+        export_params = resolve_export_params(params)
+
+        # Each cluster union is simplified in PostGIS with the same tolerance as single exports
+        tolerance_m = export_params['scale'] * SIMPLIFY_TOLERANCE_FACTOR
+        clusters = get_aoi_overlap_clusters(aoi_ids, tolerance_m)
+        if clusters is None:
+            return {"status": "error", "message": "Failed to cluster AOIs"}
+        found_ids = {aoi_id for cluster in clusters for aoi_id in cluster['aoi_ids']}
+        missing_ids = [aoi_id for aoi_id in aoi_ids if aoi_id not in found_ids]
+        if missing_ids:
+            return {"status": "error", "message": f"AOIs not found: {missing_ids}"}
+
+        pixel_area = export_params['scale'] * export_params['scale']
 
-        # Get the first image and clip to AOI
-        image = collection.first().clip(geometry)
+        exports = []
+        skipped = []
+        pixels_individual = 0
+        pixels_exported = 0
+        for cluster in clusters:
+            ids = cluster['aoi_ids']
+            name = f'AOI_{ids[0]}' if len(ids) == 1 else f'AOI_{ids[0]}_group{len(ids)}'
+            try:
+                started = start_sentinel1_export(json.loads(cluster['geometry']), name, export_params)
+            except Exception as e:
+                # Keep going so tasks already started for earlier clusters are still reported
+                skipped.append({"aoi_ids": ids, "message": f"Export failed: {str(e)}"})
+                continue
+            if started is None:
+                skipped.append({"aoi_ids": ids, "message": "No images found for these AOIs with specified parameters"})
+                continue
+            task_id, asset_id = started
+            record_export_asset(task_id, asset_id, ids, export_params)
 
-        # Set up export task
-        asset_id = f"projects/{os.getenv('GEE_PROJECT')}/assets/AOI_{aoi_id}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        task = ee.batch.Export.image.toAsset(
-            image=image,
-            description=f'AOI_{aoi_id}_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
-            assetId=asset_id,
-            scale=30,
-            region=geometry,
-            maxPixels=1e13
-        )
+            cluster_individual = int(round(cluster['individual_area_m2'] / pixel_area))
+            cluster_exported = int(round(cluster['union_area_m2'] / pixel_area))
+            pixels_individual += cluster_individual
+            pixels_exported += cluster_exported
+            exports.append({
+                "task_id": task_id,
+                "asset_id": asset_id,
+                "aoi_ids": ids,
+                "pixels_exported": cluster_exported,
+                "pixels_saved": cluster_individual - cluster_exported,
+                "vertices": {
+                    "before": cluster['vertices_before'],
+                    "after": cluster['vertices_after'],
+                    "tolerance_m": tolerance_m
+                }
+            })
 
-        # Start the task
-        task.start()
+        if not exports:
+            return {"status": "error", "message": "No export tasks were started for these AOIs", "skipped": skipped}
 
+        pixels_saved = pixels_individual - pixels_exported
         return {
             "status": "success",
-            "message": "Export task started",
-            "task_id": task.id,
-            "asset_id": asset_id,
-            "parameters": {
-                "start_date": start_date,
-                "end_date": end_date,
-                "polarization": polarization,
-                "orbit": orbit,
-                "preset_id": params.get('preset_id')
+            "message": f"Started {len(exports)} export task(s) for {len(aoi_ids)} AOIs"
+                       + (f", {len(skipped)} cluster(s) skipped" if skipped else ""),
+            "exports": exports,
+            "skipped": skipped,
+            "parameters": export_params,
+            "report": {
+                "aoi_count": len(aoi_ids),
+                "export_count": len(exports),
+                "scale": export_params['scale'],
+                "pixels_individual": pixels_individual,
+                "pixels_exported": pixels_exported,
+                "pixels_saved": pixels_saved,
+                "percent_saved": round(pixels_saved / pixels_individual * 100, 2) if pixels_individual else 0.0
             }
         }
 
     except Exception as e:
-        return {"status": "error", "message": f"Export failed: {str(e)}"}
+        return {"status": "error", "message": f"Consolidated export failed: {str(e)}"}
 
 def check_task_status(task_id):
     """Check the status of a GEE export task"""
+    import ee
+
     try:
         task_list = ee.data.getTaskList()
         task = next((t for t in task_list if t['id'] == task_id), None)
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+from app.api.gee_utils import resolve_export_params, EXPORT_SCALE, SIMPLIFY_TOLERANCE_FACTOR
+from app.models.db import get_simplified_aoi_geometry
+
+# Map ids are treated as valid for this long after getMapId
+MAPID_TTL_SECONDS = float(os.getenv('PREVIEW_MAPID_TTL_SECONDS', '3600'))
+# Past this fraction of the TTL, cached map ids are served while a refresh runs in the background
+REFRESH_FRACTION = 0.8
+
+# Sentinel-1 GRD backscatter in dB
+DEFAULT_VIS_PARAMS = {'min': -25, 'max': 0}
+
+
+class MapIdCache:
+    """
+    Caches Earth Engine map ids per preview key.
+
+    Fresh entries cost no Earth Engine calls; entries nearing expiry are
+    served immediately and refreshed in the background, once per key.
+    """
+
+    def __init__(self, ttl=MAPID_TTL_SECONDS, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._refreshing = set()
+
+    def get(self, key, create):
+        """Return (entry, cached) for key, calling create() to build a missing or expired entry."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry['created']
+                if age < self.ttl * REFRESH_FRACTION:
+                    return entry, True
+                if age < self.ttl:
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, create), daemon=True).start()
+                    return entry, True
+
+        entry = self._store(key, create())
+        return entry, False
+
+    def _refresh(self, key, create):
+        try:
+            self._store(key, create())
+        except Exception as e:
+            print(f"Preview map id refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, map_id):
+        entry = {
+            'map_id': map_id,
+            'created': time.monotonic(),
+            'expires_at': (datetime.now() + timedelta(seconds=self.ttl)).isoformat()
+        }
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Evict the oldest entry
+                del self._entries[min(self._entries, key=lambda k: self._entries[k]['created'])]
+            self._entries[key] = entry
+        return entry
+
+
+cache = MapIdCache()
+
+
+def resolve_preview_params(params=None):
+    """Fill in preview defaults; polarization is a single band for visualization"""
+    params = params or {}
+    resolved = resolve_export_params(params)
+    polarization = params.get('polarization') or 'VV'
+    if polarization not in ('VV', 'VH', 'HH', 'HV'):
+        raise ValueError("polarization must be one of VV, VH, HH, HV")
+
+    vis_params = dict(DEFAULT_VIS_PARAMS)
+    vis_params.update(params.get('vis_params') or {})
+    return {
+        'start_date': resolved['start_date'],
+        'end_date': resolved['end_date'],
+        'polarization': polarization,
+        'orbit': resolved['orbit'],
+        'preset_id': resolved['preset_id'],
+        'vis_params': vis_params
+    }
+
+
+def create_preview_map_id(geom_dict, preview_params):
+    """Build a clipped, visualized Sentinel-1 median composite and request a map id"""
+    import ee
+
+    geometry = ee.Geometry(geom_dict)
+    image = ee.ImageCollection('COPERNICUS/S1_GRD') \
+        .filterBounds(geometry) \
+        .filterDate(preview_params['start_date'], preview_params['end_date']) \
+        .filter(ee.Filter.eq('orbitProperties_pass', preview_params['orbit'])) \
+        .select(preview_params['polarization']) \
+        .median() \
+        .clip(geometry)
+
+    map_id = image.getMapId(preview_params['vis_params'])
+    return {
+        'mapid': map_id['mapid'],
+        'tile_url': map_id['tile_fetcher'].url_format
+    }
+
+
+def get_aoi_preview(aoi_id, preview_params):
+    """
+    Returns a tile URL template for a Sentinel-1 preview of an existing AOI.
+    preview_params come from resolve_preview_params, so callers can reject
+    bad parameters and missing AOIs before any geometry or Earth Engine work.
+    Map ids are cached per (AOI version, date range, polarization, orbit,
+    vis params), so repeat views make no Earth Engine calls.
+    """
+    try:
+        # The export-simplified geometry keeps preview requests small and carries the AOI version
+        simplified = get_simplified_aoi_geometry(aoi_id, EXPORT_SCALE, EXPORT_SCALE * SIMPLIFY_TOLERANCE_FACTOR)
+        if not simplified:
+            return {"status": "error", "message": "Failed to load AOI geometry"}
+
+        key = (
+            aoi_id,
+            simplified['change_seq'],
+            preview_params['start_date'],
+            preview_params['end_date'],
+            preview_params['polarization'],
+            preview_params['orbit'],
+            json.dumps(preview_params['vis_params'], sort_keys=True)
+        )
+        geom_dict = json.loads(simplified['geometry'])
+        entry, cached = cache.get(key, lambda: create_preview_map_id(geom_dict, preview_params))
+
+        return {
+            "status": "success",
+            "message": "Preview ready",
+            "tile_url": entry['map_id']['tile_url'],
+            "mapid": entry['map_id']['mapid'],
+            "expires_at": entry['expires_at'],
+            "cached": cached,
+            "parameters": preview_params
+        }
+
+    except Exception as e:
+        return {"status": "error", "message": f"Preview failed: {str(e)}"}
@@ -1,15 +1,42 @@
-from flask import Blueprint, jsonify, request, send_from_directory
-from app.models.db import create_aoi, get_aois, get_aoi, update_aoi, delete_aoi, get_db_connection
-from app.api.gee_utils import initialize_gee, export_aoi_to_asset, check_task_status
+from flask import Blueprint, jsonify, request, send_from_directory, Response, stream_with_context
+from app.models.db import create_aoi, get_aois, get_aoi, update_aoi, delete_aoi, get_aoi_changes, get_aoi_export_assets, get_aois_at_point, get_db_connection
+from app.api.gee_utils import initialize_gee, export_aoi_to_asset, export_aois_consolidated, check_task_status
+from app.api.export_events import broker, format_sse
+from app.api.map_previews import get_aoi_preview, resolve_preview_params
+from app.models.query_stats import get_slow_queries, reset_slow_queries
 import os
 import json
+import queue
 from flask import current_app
-import ee
 from datetime import datetime
 from functools import wraps
 
 api_bp = Blueprint('api', __name__)
 
+# Geometry types accepted for AOIs
+AOI_GEOMETRY_TYPES = ('Polygon', 'MultiPolygon')
+
+def parse_aoi_geometry(geometry):
+    """
+    Normalizes AOI geometry input to a GeoJSON string.
+    Returns (geometry_json, error_message); error_message is None when valid.
+    """
+    if isinstance(geometry, str):
+        try:
+            geometry = json.loads(geometry)
+        except ValueError:
+            return None, 'Geometry must be GeoJSON'
+    if not isinstance(geometry, dict) or geometry.get('type') not in AOI_GEOMETRY_TYPES:
+        return None, f"Geometry type must be one of {', '.join(AOI_GEOMETRY_TYPES)}"
+    return json.dumps(geometry), None
+
+def parse_bbox(value):
+    """Parses a min_lon,min_lat,max_lon,max_lat query value into a tuple of floats."""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4 or parts[0] > parts[2] or parts[1] > parts[3]:
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    return tuple(parts)
+
 # Global state tracker for GEE initialization
 gee_state = {
     'initialized': False,
@@ -170,14 +197,62 @@ def test_aois():
 
 @api_bp.route('/aois', methods=['GET'])
 def aois():
+    bbox = request.args.get('bbox')
+    if bbox is not None:
+        try:
+            bbox = parse_bbox(bbox)
+        except ValueError:
+            return jsonify({'message': 'Bad Request: bbox must be min_lon,min_lat,max_lon,max_lat'}), 400
+
     try:
-        aois = get_aois()
+        aois = get_aois(bbox=bbox)
         print(f"Fetched AOIs: {aois}")  # Debug logging
         return jsonify({'message': 'Successfully fetched AOIs', 'aois': aois}), 200
     except Exception as e:
         print(f"Error in /aois route: {e}")  # Debug logging
         return jsonify({'message': f'An error occurred while fetching AOIs: {e}'}), 500
 
+@api_bp.route('/aois/at', methods=['GET'])
+def aois_at_point():
+    """Return the AOIs containing a lon/lat point"""
+    try:
+        lon = float(request.args['lon'])
+        lat = float(request.args['lat'])
+    except (KeyError, ValueError):
+        return jsonify({'message': 'Bad Request: lon and lat must be numbers'}), 400
+
+    try:
+        aois = get_aois_at_point(lon, lat)
+        if aois is None:
+            return jsonify({'message': 'Error fetching AOIs at point'}), 500
+        return jsonify({'message': 'Successfully fetched AOIs', 'aois': aois}), 200
+    except Exception as e:
+        return jsonify({'message': f'An error occurred while fetching AOIs: {e}'}), 500
+
+@api_bp.route('/aois/changes', methods=['GET'])
+def aoi_changes():
+    """Return AOIs created/updated and ids deleted since a change token"""
+    since = request.args.get('since', '0')
+    try:
+        since = int(since)
+    except ValueError:
+        return jsonify({'message': 'Bad Request: since must be an integer change token'}), 400
+    if since < 0:
+        return jsonify({'message': 'Bad Request: since must be a non-negative change token'}), 400
+
+    try:
+        changes = get_aoi_changes(since)
+        if changes is None:
+            return jsonify({'message': 'Error fetching AOI changes'}), 500
+        return jsonify({
+            'message': 'Successfully fetched AOI changes',
+            'aois': changes['aois'],
+            'deleted': changes['deleted'],
+            'next_token': str(changes['next_token'])
+        }), 200
+    except Exception as e:
+        return jsonify({'message': f'An error occurred while fetching AOI changes: {e}'}), 500
+
 @api_bp.route('/aois', methods=['POST'])
 def create_new_aoi():
     data = request.get_json()
@@ -194,9 +269,10 @@ def create_new_aoi():
         geometry = data['geometry']
         print(f"Input geometry: {geometry}")  # Debug log
         
-        # Ensure geometry is a string
-        if isinstance(geometry, dict):
-            geometry = json.dumps(geometry)
+        # Ensure geometry is a Polygon/MultiPolygon GeoJSON string
+        geometry, error = parse_aoi_geometry(geometry)
+        if error:
+            return jsonify({'message': f'Bad Request: {error}'}), 400
         print(f"Processed geometry: {geometry}")  # Debug log
         
         # Get optional description
@@ -229,8 +305,12 @@ def update_existing_aoi(aoi_id):
     if not data['name'] or not data['geometry']:
         return jsonify({'message': 'Bad Request: Name and geometry cannot be empty'}), 400
 
+    geometry, error = parse_aoi_geometry(data['geometry'])
+    if error:
+        return jsonify({'message': f'Bad Request: {error}'}), 400
+
     try:
-        success = update_aoi(aoi_id, data['name'], data['geometry'])
+        success = update_aoi(aoi_id, data['name'], geometry, data.get('description'))
         if success:
             return jsonify({'message': 'AOI updated'}), 200
         else:
@@ -300,7 +380,8 @@ def export_aoi(aoi_id):
             'start_date': data.get('start_date'),
             'end_date': data.get('end_date'),
             'polarization': data.get('polarization', ['VV', 'VH']),
-            'orbit': data.get('orbit', 'ASCENDING')
+            'orbit': data.get('orbit', 'ASCENDING'),
+            'scale': data.get('scale')
         }
         
         result = export_aoi_to_asset(aoi_id, params)
@@ -308,13 +389,130 @@ def export_aoi(aoi_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@api_bp.route('/aois/<int:aoi_id>/preview', methods=['GET'])
+@ensure_gee_initialized
+def preview_aoi(aoi_id):
+    """Get a tile URL template for a Sentinel-1 preview of an AOI"""
+    try:
+        vis_params = {}
+        for name in ('min', 'max'):
+            if request.args.get(name) is not None:
+                vis_params[name] = float(request.args[name])
+        if request.args.get('palette'):
+            vis_params['palette'] = request.args['palette'].split(',')
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'min and max must be numbers'}), 400
+
+    try:
+        params = {
+            'preset_id': request.args.get('preset_id'),
+            'start_date': request.args.get('start_date'),
+            'end_date': request.args.get('end_date'),
+            'polarization': request.args.get('polarization', 'VV'),
+            'orbit': request.args.get('orbit', 'ASCENDING'),
+            'vis_params': vis_params
+        }
+
+        try:
+            preview_params = resolve_preview_params(params)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        if not get_aoi(aoi_id):
+            return jsonify({'status': 'error', 'message': 'AOI not found'}), 404
+
+        result = get_aoi_preview(aoi_id, preview_params)
+        return jsonify(result), 200 if result['status'] == 'success' else 500
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api_bp.route('/export/consolidated', methods=['POST'])
+@ensure_gee_initialized
+def export_consolidated():
+    """Export a set of AOIs with shared parameters, exporting overlapping AOIs once"""
+    try:
+        data = request.get_json() or {}
+        aoi_ids = data.get('aoi_ids')
+        if not isinstance(aoi_ids, list) or not aoi_ids:
+            return jsonify({'status': 'error', 'message': 'aoi_ids must be a non-empty list'}), 400
+        try:
+            aoi_ids = list(dict.fromkeys(int(aoi_id) for aoi_id in aoi_ids))
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'aoi_ids must be integers'}), 400
+
+        params = {
+            'preset_id': data.get('preset_id'),
+            'start_date': data.get('start_date'),
+            'end_date': data.get('end_date'),
+            'polarization': data.get('polarization', ['VV', 'VH']),
+            'orbit': data.get('orbit', 'ASCENDING'),
+            'scale': data.get('scale')
+        }
+
+        result = export_aois_consolidated(aoi_ids, params)
+        return jsonify(result), 200 if result['status'] == 'success' else 500
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api_bp.route('/aois/<int:aoi_id>/assets', methods=['GET'])
+def get_aoi_assets(aoi_id):
+    """List exported assets covering an AOI, including consolidated exports"""
+    try:
+        assets = get_aoi_export_assets(aoi_id)
+        if assets is None:
+            return jsonify({'message': 'Error fetching export assets'}), 500
+        return jsonify({'message': 'Export assets fetched successfully', 'assets': assets}), 200
+    except Exception as e:
+        return jsonify({'message': f'Error fetching export assets: {e}'}), 500
+
 @api_bp.route('/export/status/<task_id>', methods=['GET'])
 @ensure_gee_initialized
 def get_export_status(task_id):
     """Check status of an export task"""
+    # Serve from the event stream's last observation when it is fresh
+    cached_state = broker.get_cached_state(task_id)
+    if cached_state:
+        return jsonify({"status": "success", "task_status": cached_state}), 200
     result = check_task_status(task_id)
     return jsonify(result), 200 if result['status'] == 'success' else 500
 
+@api_bp.route('/export/events', methods=['GET'])
+@ensure_gee_initialized
+def export_events():
+    """Stream export task state transitions as Server-Sent Events"""
+    task_id = request.args.get('task_id')
+    aoi_id = request.args.get('aoi_id')
+    if aoi_id is not None:
+        try:
+            aoi_id = int(aoi_id)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'aoi_id must be an integer'}), 400
+
+    # Each open stream holds a server thread, so the broker caps concurrent subscribers
+    subscriber = broker.subscribe(task_id=task_id, aoi_id=aoi_id)
+    if subscriber is None:
+        return jsonify({'status': 'error', 'message': 'Too many open export event streams, try again later'}), 503
+
+    def generate():
+        try:
+            for event in broker.snapshot(subscriber):
+                yield format_sse(event, event='task', event_id=broker.next_event_id())
+            while not subscriber.overflowed:
+                try:
+                    event = subscriber.queue.get(timeout=15)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event, event='task', event_id=broker.next_event_id())
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api_bp.route('/auth/db/status', methods=['GET'])
 def check_db_status():
     """Check database connection status"""
@@ -437,11 +635,32 @@ def dev_dashboard():
     """Serve the development dashboard"""
     return send_from_directory('static', 'dev.html')
 
+@api_bp.route('/dev/slow-queries', methods=['GET'])
+def list_slow_queries():
+    """List the slowest recorded SQL statements with sampled EXPLAIN plans"""
+    order_by = request.args.get('order_by', 'total_ms')
+    if order_by not in ('total_ms', 'max_ms', 'calls', 'last_ms'):
+        return jsonify({"status": "error", "message": "order_by must be total_ms, max_ms, calls or last_ms"}), 400
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+
+    return jsonify(dict(get_slow_queries(limit=limit, order_by=order_by), status="success")), 200
+
+@api_bp.route('/dev/slow-queries', methods=['DELETE'])
+def clear_slow_queries():
+    """Reset the slow query log"""
+    reset_slow_queries()
+    return jsonify({"status": "success", "message": "Slow query log cleared"}), 200
+
 @api_bp.route('/test', methods=['GET'])
 @ensure_gee_initialized
 def test():
     """Legacy test endpoint - use /auth/gee for authentication and /auth/gee/status for status checks"""
     try:
+        import ee
+
         # Get basic GEE info without re-authenticating
         image = ee.Image('USGS/SRTMGL1_003')
         info = image.getInfo()
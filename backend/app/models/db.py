@@ -1,8 +1,7 @@
 import os
 import psycopg2
-from dotenv import load_dotenv
-
-load_dotenv()
+import psycopg2.extensions
+from app.models.query_stats import TimedCursor
 
 def get_db_connection():
     """Establishes a connection to the PostgreSQL database."""
@@ -13,7 +12,8 @@ def get_db_connection():
             port=os.environ.get("DB_PORT"),
             database=os.environ.get("DB_NAME"),
             user=os.environ.get("DB_USER"),
-            password=os.environ.get("DB_PASSWORD")
+            password=os.environ.get("DB_PASSWORD"),
+            cursor_factory=TimedCursor  # Times every query for the slow query log
         )
         print("Database connection successful") # Debugging
     except psycopg2.Error as e:
@@ -62,8 +62,63 @@ def create_aoi(name, geometry, description=None):
         print("Failed to establish database connection.")
         return None
 
-def get_aois():
-    """Retrieves all AOIs from the database."""
+def get_aois(bbox=None):
+    """
+    Retrieves all AOIs from the database.
+    bbox (min_lon, min_lat, max_lon, max_lat) limits the result to AOIs
+    intersecting that viewport; subdivided pieces find the candidates and
+    the geography column confirms them.
+    """
+    conn = get_db_connection()
+    aois = []
+    if conn is not None:
+        try:
+            with conn.cursor() as cur:
+                if bbox is None:
+                    cur.execute("""
+                        SELECT id, name, description, ST_AsGeoJSON(geometry) as geometry,
+                               created_at, updated_at
+                        FROM aois
+                        ORDER BY created_at DESC
+                    """)
+                else:
+                    # Pieces narrow down candidates; the geography column gives the exact answer
+                    cur.execute("""
+                        WITH viewport AS (
+                            SELECT area, ST_Segmentize(area, 1000)::geometry AS search
+                            FROM (SELECT ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography AS area) AS envelope
+                        ), candidates AS (
+                            SELECT DISTINCT p.aoi_id
+                            FROM aoi_pieces p, viewport v
+                            WHERE ST_Intersects(p.geometry, v.search)
+                        )
+                        SELECT a.id, a.name, a.description, ST_AsGeoJSON(a.geometry) as geometry,
+                               a.created_at, a.updated_at
+                        FROM aois a
+                        JOIN candidates c ON c.aoi_id = a.id
+                        CROSS JOIN viewport v
+                        WHERE ST_Intersects(a.geometry, v.area)
+                        ORDER BY a.created_at DESC
+                    """, tuple(bbox))
+                rows = cur.fetchall()
+                for row in rows:
+                    aois.append({
+                        'id': row[0],
+                        'name': row[1],
+                        'description': row[2],
+                        'geometry': row[3],
+                        'created_at': row[4].isoformat() if row[4] else None,
+                        'updated_at': row[5].isoformat() if row[5] else None
+                    })
+        except psycopg2.Error as e:
+            print(f"Error getting AOIs: {e}")
+            return None
+        finally:
+            conn.close()
+    return aois
+
+def get_aois_at_point(lon, lat):
+    """Retrieves the AOIs containing a point, found via their subdivided pieces."""
     conn = get_db_connection()
     aois = []
     if conn is not None:
@@ -73,8 +128,13 @@ def get_aois():
                     SELECT id, name, description, ST_AsGeoJSON(geometry) as geometry,
                            created_at, updated_at
                     FROM aois
+                    WHERE id IN (
+                        SELECT aoi_id FROM aoi_pieces
+                        WHERE ST_Intersects(geometry, ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326))
+                    )
+                    AND ST_Intersects(geometry, ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326)::geography)
                     ORDER BY created_at DESC
-                """)
+                """, {'lon': lon, 'lat': lat})
                 rows = cur.fetchall()
                 for row in rows:
                     aois.append({
@@ -86,7 +146,7 @@ def get_aois():
                         'updated_at': row[5].isoformat() if row[5] else None
                     })
         except psycopg2.Error as e:
-            print(f"Error getting AOIs: {e}")
+            print(f"Error getting AOIs at point: {e}")
             return None
         finally:
             conn.close()
@@ -159,4 +219,305 @@ def delete_aoi(aoi_id):
             print(f"Error deleting AOI: {e}")
             return False
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+def get_aoi_changes(since=0):
+    """
+    Retrieves AOIs created/updated and AOI ids deleted after a change token.
+    A full sync (since=0) skips tombstones, since the client has nothing to delete.
+    """
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            # One snapshot for both tables, so a change committing between the
+            # two queries cannot push next_token past a row we did not return
+            conn.set_session(
+                isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                readonly=True
+            )
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id, name, description, ST_AsGeoJSON(geometry) as geometry,
+                           created_at, updated_at, change_seq
+                    FROM aois
+                    WHERE change_seq > %s
+                    ORDER BY change_seq
+                """, (since,))
+                rows = cur.fetchall()
+
+                if since > 0:
+                    cur.execute("""
+                        SELECT aoi_id, change_seq
+                        FROM aoi_tombstones
+                        WHERE change_seq > %s
+                        ORDER BY change_seq
+                    """, (since,))
+                    tombstones = cur.fetchall()
+                    latest_tombstone = max((row[1] for row in tombstones), default=None)
+                else:
+                    tombstones = []
+                    cur.execute("SELECT max(change_seq) FROM aoi_tombstones")
+                    latest_tombstone = cur.fetchone()[0]
+                conn.commit()
+
+                aois = [{
+                    'id': row[0],
+                    'name': row[1],
+                    'description': row[2],
+                    'geometry': row[3],
+                    'created_at': row[4].isoformat() if row[4] else None,
+                    'updated_at': row[5].isoformat() if row[5] else None
+                } for row in rows]
+                deleted = [row[0] for row in tombstones]
+
+                # The next token is the highest change seen; if nothing changed, keep the caller's token
+                seqs = [row[6] for row in rows]
+                if latest_tombstone is not None:
+                    seqs.append(latest_tombstone)
+                next_token = max(seqs + [since])
+                return {'aois': aois, 'deleted': deleted, 'next_token': next_token}
+        except psycopg2.Error as e:
+            print(f"Error getting AOI changes: {e}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+
+def get_aoi_overlap_clusters(aoi_ids, tolerance_m):
+    """
+    Groups AOIs into clusters of overlapping (or identical) geometries.
+    Returns one entry per cluster with its AOI ids, the GeoJSON union
+    simplified for export, vertex counts before/after simplification and
+    the summed individual vs union areas in square meters.
+    The union is simplified the same way as get_simplified_aoi_geometry
+    (buffer by twice the tolerance, simplify by the tolerance, keep the
+    original if that does not cover it or reduce the vertex count).
+    """
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    WITH clustered AS (
+                        SELECT id, geometry,
+                               ST_ClusterDBSCAN(geometry::geometry, eps := 0, minpoints := 1)
+                                   OVER () AS cluster_id
+                        FROM aois
+                        WHERE id = ANY(%(aoi_ids)s)
+                    ), unioned AS (
+                        SELECT cluster_id,
+                               array_agg(id ORDER BY id) AS ids,
+                               ST_Union(geometry::geometry) AS geom,
+                               SUM(ST_Area(geometry)) AS individual_area
+                        FROM clustered
+                        GROUP BY cluster_id
+                    ), simplified AS (
+                        SELECT ids, geom, individual_area,
+                               ST_SimplifyPreserveTopology(
+                                   ST_Buffer(geom::geography, %(buffer_m)s, 'quad_segs=2')::geometry,
+                                   %(tolerance_deg)s
+                               ) AS simple
+                        FROM unioned
+                    ), chosen AS (
+                        SELECT ids, geom, individual_area,
+                               CASE WHEN ST_NPoints(simple) < ST_NPoints(geom) AND ST_Covers(simple, geom)
+                                    THEN simple ELSE geom END AS export_geom
+                        FROM simplified
+                    )
+                    SELECT ids,
+                           ST_AsGeoJSON(export_geom),
+                           individual_area,
+                           ST_Area(geom::geography),
+                           ST_NPoints(geom),
+                           ST_NPoints(export_geom)
+                    FROM chosen
+                    ORDER BY ids[1]
+                """, {
+                    'aoi_ids': list(aoi_ids),
+                    'buffer_m': tolerance_m * 2,
+                    'tolerance_deg': tolerance_m / 111320.0
+                })
+                return [{
+                    'aoi_ids': row[0],
+                    'geometry': row[1],
+                    'individual_area_m2': float(row[2]),
+                    'union_area_m2': float(row[3]),
+                    'vertices_before': row[4],
+                    'vertices_after': row[5]
+                } for row in cur.fetchall()]
+        except psycopg2.Error as e:
+            print(f"Error clustering AOIs: {e}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+
+def record_export_asset(task_id, asset_id, aoi_ids, params):
+    """Records an exported asset and the AOIs it covers."""
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO export_assets (task_id, asset_id, start_date, end_date, polarization, orbit, scale)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (task_id, asset_id, params['start_date'], params['end_date'],
+                     list(params['polarization']), params['orbit'], params['scale'])
+                )
+                export_asset_id = cur.fetchone()[0]
+                cur.executemany(
+                    "INSERT INTO export_asset_aois (export_asset_id, aoi_id) VALUES (%s, %s)",
+                    [(export_asset_id, aoi_id) for aoi_id in aoi_ids]
+                )
+                conn.commit()
+                return export_asset_id
+        except psycopg2.Error as e:
+            print(f"Error recording export asset: {e}")
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+    return None
+
+
+def get_export_task_aoi_ids(task_ids):
+    """Maps export task ids to the ids of the AOIs their assets cover."""
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT ea.task_id, array_agg(eaa.aoi_id ORDER BY eaa.aoi_id)
+                    FROM export_assets ea
+                    JOIN export_asset_aois eaa ON eaa.export_asset_id = ea.id
+                    WHERE ea.task_id = ANY(%s)
+                    GROUP BY ea.task_id
+                """, (list(task_ids),))
+                return {row[0]: row[1] for row in cur.fetchall()}
+        except psycopg2.Error as e:
+            print(f"Error getting export task AOIs: {e}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+
+def get_aoi_export_assets(aoi_id):
+    """Retrieves the exported assets covering an AOI, newest first."""
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT ea.task_id, ea.asset_id, ea.start_date, ea.end_date,
+                           ea.polarization, ea.orbit, ea.scale, ea.created_at,
+                           array_agg(covered.aoi_id ORDER BY covered.aoi_id)
+                    FROM export_asset_aois eaa
+                    JOIN export_assets ea ON ea.id = eaa.export_asset_id
+                    JOIN export_asset_aois covered ON covered.export_asset_id = ea.id
+                    WHERE eaa.aoi_id = %s
+                    GROUP BY ea.id
+                    ORDER BY ea.created_at DESC
+                """, (aoi_id,))
+                return [{
+                    'task_id': row[0],
+                    'asset_id': row[1],
+                    'start_date': row[2].isoformat() if row[2] else None,
+                    'end_date': row[3].isoformat() if row[3] else None,
+                    'polarization': row[4],
+                    'orbit': row[5],
+                    'scale': row[6],
+                    'created_at': row[7].isoformat() if row[7] else None,
+                    'aoi_ids': row[8]
+                } for row in cur.fetchall()]
+        except psycopg2.Error as e:
+            print(f"Error getting export assets: {e}")
+            return None
+        finally:
+            conn.close()
+    return None
+
+
+def get_simplified_aoi_geometry(aoi_id, scale, tolerance_m):
+    """
+    Retrieves an AOI's geometry simplified for export at a given scale.
+    The AOI is buffered by twice the tolerance and then simplified by the
+    tolerance, so the result always covers the original shape; if that does
+    not reduce the vertex count the original geometry is used. Results are
+    cached in aoi_simplified per (AOI version, scale).
+    Returns a dict with the GeoJSON geometry, vertex counts before/after and
+    the AOI version (change_seq) it was built from.
+    """
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT ST_AsGeoJSON(s.geometry), s.vertices_before, s.vertices_after, s.change_seq
+                    FROM aoi_simplified s
+                    JOIN aois a ON a.id = s.aoi_id AND a.change_seq = s.change_seq
+                    WHERE s.aoi_id = %s AND s.scale = %s
+                """, (aoi_id, scale))
+                row = cur.fetchone()
+                cached = row is not None
+
+                if not cached:
+                    # Tolerance in degrees uses meters per degree of latitude; a degree of
+                    # longitude is never longer, so deviation stays within tolerance_m
+                    cur.execute("""
+                        WITH source AS (
+                            SELECT id, change_seq, geometry::geometry AS geom
+                            FROM aois
+                            WHERE id = %(aoi_id)s
+                        ), simplified AS (
+                            SELECT id, change_seq, geom,
+                                   ST_SimplifyPreserveTopology(
+                                       ST_Buffer(geom::geography, %(buffer_m)s, 'quad_segs=2')::geometry,
+                                       %(tolerance_deg)s
+                                   ) AS simple
+                            FROM source
+                        ), chosen AS (
+                            SELECT id, change_seq, ST_NPoints(geom) AS vertices_before,
+                                   CASE WHEN ST_NPoints(simple) < ST_NPoints(geom) AND ST_Covers(simple, geom)
+                                        THEN simple ELSE geom END AS geometry
+                            FROM simplified
+                        )
+                        INSERT INTO aoi_simplified (aoi_id, scale, change_seq, geometry, vertices_before, vertices_after)
+                        SELECT id, %(scale)s, change_seq, geometry, vertices_before, ST_NPoints(geometry)
+                        FROM chosen
+                        ON CONFLICT (aoi_id, scale) DO UPDATE
+                            SET change_seq = EXCLUDED.change_seq,
+                                geometry = EXCLUDED.geometry,
+                                vertices_before = EXCLUDED.vertices_before,
+                                vertices_after = EXCLUDED.vertices_after
+                        RETURNING ST_AsGeoJSON(geometry), vertices_before, vertices_after, change_seq
+                    """, {
+                        'aoi_id': aoi_id,
+                        'scale': scale,
+                        'buffer_m': tolerance_m * 2,
+                        'tolerance_deg': tolerance_m / 111320.0
+                    })
+                    row = cur.fetchone()
+                    conn.commit()
+
+                if row is None:
+                    return None
+                return {
+                    'geometry': row[0],
+                    'vertices_before': row[1],
+                    'vertices_after': row[2],
+                    'change_seq': row[3],
+                    'cached': cached
+                }
+        except psycopg2.Error as e:
+            print(f"Error simplifying AOI geometry: {e}")
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+    return None
@@ -0,0 +1,149 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from datetime import datetime
+import psycopg2.extensions
+
+# Statements slower than this are recorded as slow queries
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+# Probability that a slow statement is re-run under EXPLAIN to capture its plan; 0 disables EXPLAIN
+EXPLAIN_SAMPLE_RATE = float(os.getenv('EXPLAIN_SAMPLE_RATE', '0.1'))
+# Number of distinct slow statements kept in memory
+MAX_SLOW_STATEMENTS = 100
+
+# Statements containing any of these are never run under EXPLAIN ANALYZE
+WRITE_KEYWORDS = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE)\b', re.IGNORECASE)
+
+_lock = threading.Lock()
+_slow_statements = {}
+_totals = {'queries': 0, 'slow_queries': 0, 'total_ms': 0.0}
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that times every statement and records the slow ones."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(self, query, vars, (time.perf_counter() - start) * 1000)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(self, query, None, (time.perf_counter() - start) * 1000)
+
+
+def _statement_key(query):
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    # Parameters stay as %s placeholders, so calls with different values share a key
+    return ' '.join(str(query).split())
+
+
+def record_query(cursor, query, vars, duration_ms):
+    """Record a timed statement; slow ones may get a sampled EXPLAIN plan."""
+    key = _statement_key(query)
+    slow = duration_ms >= SLOW_QUERY_MS
+    with _lock:
+        _totals['queries'] += 1
+        _totals['total_ms'] += duration_ms
+        if not slow:
+            return
+        _totals['slow_queries'] += 1
+        entry = _slow_statements.get(key)
+        if entry is None:
+            if len(_slow_statements) >= MAX_SLOW_STATEMENTS:
+                # Evict the statement with the least accumulated slow time
+                del _slow_statements[min(_slow_statements, key=lambda k: _slow_statements[k]['total_ms'])]
+            entry = _slow_statements[key] = {
+                'statement': key,
+                'calls': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'last_ms': 0.0,
+                'last_seen': None,
+                'plan': None,
+                'plan_sampled_at': None
+            }
+        entry['calls'] += 1
+        entry['total_ms'] += duration_ms
+        entry['max_ms'] = max(entry['max_ms'], duration_ms)
+        entry['last_ms'] = duration_ms
+        entry['last_seen'] = datetime.now().isoformat()
+        # A statement without a plan yet is sampled first, unless sampling is disabled
+        sample = EXPLAIN_SAMPLE_RATE > 0 and (entry['plan'] is None or random.random() < EXPLAIN_SAMPLE_RATE)
+
+    # executemany has no single parameter set to plan with
+    if sample and (vars is not None or '%s' not in key):
+        plan = explain(cursor.connection, query, vars)
+        if plan is not None:
+            with _lock:
+                if key in _slow_statements:
+                    _slow_statements[key]['plan'] = plan
+                    _slow_statements[key]['plan_sampled_at'] = datetime.now().isoformat()
+
+
+def explain(conn, query, vars):
+    """
+    Capture the plan for a statement on the connection that ran it.
+    Only plain reads (SELECT/WITH with no INSERT/UPDATE/DELETE anywhere,
+    including data-modifying CTEs) run under EXPLAIN (ANALYZE, BUFFERS), and
+    only inside a savepoint that is always rolled back. Everything else, and
+    anything on an autocommit connection, gets a plain EXPLAIN, so sampling
+    never repeats a statement's side effects.
+    """
+    if conn.closed or conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+        return None
+    statement = _statement_key(query)
+    use_savepoint = not conn.autocommit
+    analyze = (
+        use_savepoint
+        and statement.split(' ', 1)[0].upper() in ('SELECT', 'WITH')
+        and not WRITE_KEYWORDS.search(statement)
+    )
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    # A plain cursor, so the EXPLAIN itself is not timed or recorded
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        try:
+            if use_savepoint:
+                cur.execute("SAVEPOINT query_stats_explain")
+            cur.execute(f"EXPLAIN ({options}) {query}", vars)
+            plan = cur.fetchone()[0]
+            return plan if not isinstance(plan, str) else json.loads(plan)
+        except psycopg2.Error as e:
+            print(f"Error sampling EXPLAIN plan: {e}")
+            return None
+        finally:
+            if use_savepoint:
+                # Roll back whatever the EXPLAIN did, then drop the savepoint
+                cur.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+                cur.execute("RELEASE SAVEPOINT query_stats_explain")
+
+
+def get_slow_queries(limit=10, order_by='total_ms'):
+    """Top slow statements with their most recently sampled plans."""
+    with _lock:
+        entries = [dict(entry) for entry in _slow_statements.values()]
+        totals = dict(_totals)
+    entries.sort(key=lambda entry: entry[order_by], reverse=True)
+    for entry in entries:
+        entry['mean_ms'] = entry['total_ms'] / entry['calls']
+    return {
+        'threshold_ms': SLOW_QUERY_MS,
+        'explain_sample_rate': EXPLAIN_SAMPLE_RATE,
+        'totals': totals,
+        'statements': entries[:limit]
+    }
+
+
+def reset_slow_queries():
+    with _lock:
+        _slow_statements.clear()
+        _totals.update({'queries': 0, 'slow_queries': 0, 'total_ms': 0.0})
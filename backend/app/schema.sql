@@ -4,11 +4,23 @@ CREATE TABLE aois (
     id SERIAL PRIMARY KEY,
     name TEXT NOT NULL,
     description TEXT,
-    geometry GEOGRAPHY(POLYGON, 4326) NOT NULL,
+    geometry GEOGRAPHY(GEOMETRY, 4326) NOT NULL
+        CHECK (GeometryType(geometry) IN ('POLYGON', 'MULTIPOLYGON')),
     created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    change_seq BIGINT
+);
+
+-- Subdivided pieces of each AOI so spatial lookups hit small index boxes
+CREATE TABLE aoi_pieces (
+    id SERIAL PRIMARY KEY,
+    aoi_id INTEGER NOT NULL REFERENCES aois(id) ON DELETE CASCADE,
+    geometry GEOMETRY(GEOMETRY, 4326) NOT NULL
 );
 
+CREATE INDEX idx_aoi_pieces_geometry ON aoi_pieces USING GIST (geometry);
+CREATE INDEX idx_aoi_pieces_aoi_id ON aoi_pieces (aoi_id);
+
 CREATE TABLE export_tasks (
     id SERIAL PRIMARY KEY,
     aoi_id INTEGER REFERENCES aois(id),
@@ -21,6 +33,38 @@ CREATE TABLE export_tasks (
     error_message TEXT
 );
 
+-- Export geometries simplified per AOI version and export scale
+CREATE TABLE aoi_simplified (
+    aoi_id INTEGER NOT NULL REFERENCES aois(id) ON DELETE CASCADE,
+    scale DOUBLE PRECISION NOT NULL,
+    change_seq BIGINT NOT NULL,
+    geometry GEOMETRY(GEOMETRY, 4326) NOT NULL,
+    vertices_before INTEGER NOT NULL,
+    vertices_after INTEGER NOT NULL,
+    PRIMARY KEY (aoi_id, scale)
+);
+
+-- Exported GEE assets and the AOIs each one covers
+CREATE TABLE export_assets (
+    id SERIAL PRIMARY KEY,
+    task_id TEXT UNIQUE,
+    asset_id TEXT NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    polarization TEXT[] NOT NULL,
+    orbit TEXT NOT NULL,
+    scale DOUBLE PRECISION NOT NULL DEFAULT 30,
+    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE export_asset_aois (
+    export_asset_id INTEGER REFERENCES export_assets(id) ON DELETE CASCADE,
+    aoi_id INTEGER REFERENCES aois(id) ON DELETE CASCADE,
+    PRIMARY KEY (export_asset_id, aoi_id)
+);
+
+CREATE INDEX idx_export_asset_aois_aoi_id ON export_asset_aois (aoi_id);
+
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -36,6 +80,80 @@ CREATE TRIGGER update_aois_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Change sequence for incremental AOI sync (GET /api/aois/changes)
+CREATE SEQUENCE aoi_change_seq;
+
+CREATE INDEX idx_aois_change_seq ON aois (change_seq);
+
+-- Deleted AOIs leave a tombstone so clients can sync deletions
+CREATE TABLE aoi_tombstones (
+    aoi_id INTEGER PRIMARY KEY,
+    change_seq BIGINT NOT NULL,
+    deleted_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_aoi_tombstones_change_seq ON aoi_tombstones (change_seq);
+
+-- Function to stamp each AOI insert/update with the next change sequence
+CREATE OR REPLACE FUNCTION set_aoi_change_seq()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Held until commit so change_seq order matches commit order; otherwise a
+    -- client could sync past a lower seq whose transaction had not committed yet
+    PERFORM pg_advisory_xact_lock(hashtext('aoi_change_seq'));
+    NEW.change_seq = nextval('aoi_change_seq');
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+-- Function to record a tombstone when an AOI is deleted
+CREATE OR REPLACE FUNCTION record_aoi_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('aoi_change_seq'));
+    INSERT INTO aoi_tombstones (aoi_id, change_seq)
+    VALUES (OLD.id, nextval('aoi_change_seq'))
+    ON CONFLICT (aoi_id) DO UPDATE
+        SET change_seq = EXCLUDED.change_seq, deleted_at = CURRENT_TIMESTAMP;
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+-- Triggers for AOI change tracking
+CREATE TRIGGER set_aois_change_seq
+    BEFORE INSERT OR UPDATE ON aois
+    FOR EACH ROW
+    EXECUTE FUNCTION set_aoi_change_seq();
+
+CREATE TRIGGER record_aois_tombstone
+    AFTER DELETE ON aois
+    FOR EACH ROW
+    EXECUTE FUNCTION record_aoi_tombstone();
+
+-- Function to rebuild an AOI's subdivided pieces (deletes cascade from aois)
+CREATE OR REPLACE FUNCTION rebuild_aoi_pieces()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM aoi_pieces WHERE aoi_id = NEW.id;
+    -- Densify along great circles first, so the planar pieces follow the geodesic edges
+    INSERT INTO aoi_pieces (aoi_id, geometry)
+    SELECT NEW.id, ST_Subdivide(ST_Segmentize(NEW.geometry, 1000)::geometry, 64);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Triggers for AOI pieces
+CREATE TRIGGER insert_aois_pieces
+    AFTER INSERT ON aois
+    FOR EACH ROW
+    EXECUTE FUNCTION rebuild_aoi_pieces();
+
+CREATE TRIGGER update_aois_pieces
+    AFTER UPDATE OF geometry ON aois
+    FOR EACH ROW
+    WHEN (ST_AsBinary(OLD.geometry) IS DISTINCT FROM ST_AsBinary(NEW.geometry))
+    EXECUTE FUNCTION rebuild_aoi_pieces();
+
 -- Trigger for export_tasks table
 CREATE TRIGGER update_export_tasks_updated_at
     BEFORE UPDATE ON export_tasks
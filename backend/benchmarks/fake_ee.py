@@ -0,0 +1,174 @@
+"""
+In-process stand-in for the Earth Engine client used by the benchmarks.
+
+Covers the parts of the `ee` API the backend calls. Every call that would hit
+Earth Engine servers (getInfo, Initialize, task start, getTaskList) sleeps for
+a configurable latency so benchmarks reflect round-trip cost without a live
+GEE account. Install it with `install(latency_ms)` before the app's first GEE
+use; the backend imports `ee` lazily so the fake is picked up.
+"""
+import sys
+import time
+import uuid
+import threading
+
+_config = {'latency_s': 0.0}
+_calls = {'server': 0}
+_tasks = {}
+_tasks_lock = threading.Lock()
+
+
+def set_latency(latency_ms):
+    _config['latency_s'] = latency_ms / 1000.0
+
+
+def server_call_count():
+    return _calls['server']
+
+
+def reset():
+    _calls['server'] = 0
+    with _tasks_lock:
+        _tasks.clear()
+
+
+def _server_call():
+    _calls['server'] += 1
+    if _config['latency_s']:
+        time.sleep(_config['latency_s'])
+
+
+class _ComputedObject:
+    def __init__(self, value=None):
+        self._value = value
+
+    def getInfo(self):
+        _server_call()
+        return self._value
+
+
+class Number(_ComputedObject):
+    pass
+
+
+class Geometry(_ComputedObject):
+    def __init__(self, geo_json=None, *args, **kwargs):
+        super().__init__(geo_json)
+
+
+class Filter:
+    @staticmethod
+    def eq(name, value):
+        return ('eq', name, value)
+
+
+class Image(_ComputedObject):
+    def __init__(self, image_id=None):
+        super().__init__({'type': 'Image', 'id': image_id, 'bands': []})
+
+    def clip(self, geometry):
+        return self
+
+    def getMapId(self, vis_params=None):
+        _server_call()
+        mapid = f"projects/fake/maps/{uuid.uuid4().hex}"
+        return {
+            'mapid': mapid,
+            'token': '',
+            'tile_fetcher': _TileFetcher(f"https://earthengine.googleapis.com/v1/{mapid}/tiles/{{z}}/{{x}}/{{y}}")
+        }
+
+
+class _TileFetcher:
+    def __init__(self, url_format):
+        self.url_format = url_format
+
+
+class ImageCollection(_ComputedObject):
+    def __init__(self, collection_id=None):
+        super().__init__({'type': 'ImageCollection', 'id': collection_id})
+
+    def filterBounds(self, geometry):
+        return self
+
+    def filterDate(self, start, end):
+        return self
+
+    def filter(self, ee_filter):
+        return self
+
+    def select(self, bands):
+        return self
+
+    def size(self):
+        return Number(1)
+
+    def first(self):
+        return Image(self._value['id'])
+
+    def median(self):
+        return Image(self._value['id'])
+
+
+class ServiceAccountCredentials:
+    def __init__(self, email=None, key_file=None):
+        self.email = email
+        self.key_file = key_file
+
+
+def Initialize(credentials=None, project=None, **kwargs):
+    _server_call()
+
+
+class _Task:
+    def __init__(self, description):
+        self.id = uuid.uuid4().hex[:24].upper()
+        self.description = description
+
+    def start(self):
+        _server_call()
+        with _tasks_lock:
+            _tasks[self.id] = {
+                'id': self.id,
+                'description': self.description,
+                'state': 'READY',
+                'polls': 0
+            }
+
+
+class _ImageExport:
+    @staticmethod
+    def toAsset(image=None, description='', assetId=None, **kwargs):
+        return _Task(description)
+
+
+class _Export:
+    image = _ImageExport
+
+
+class batch:
+    Export = _Export
+
+
+# Task states advance one step each time the task list is observed
+_PROGRESSION = ['READY', 'RUNNING', 'COMPLETED']
+
+
+class data:
+    @staticmethod
+    def getTaskList():
+        _server_call()
+        with _tasks_lock:
+            tasks = []
+            for task in _tasks.values():
+                task['polls'] += 1
+                task['state'] = _PROGRESSION[min(task['polls'] // 2, len(_PROGRESSION) - 1)]
+                tasks.append({k: v for k, v in task.items() if k != 'polls'})
+            return tasks
+
+
+def install(latency_ms=0.0):
+    """Register this module as `ee` so the backend's lazy imports resolve to it."""
+    set_latency(latency_ms)
+    sys.modules['ee'] = sys.modules[__name__]
+    return sys.modules[__name__]
@@ -0,0 +1,338 @@
+"""
+Reproducible backend benchmarks.
+
+Seeds a local PostGIS database with synthetic AOIs at each requested size,
+runs the api_bp endpoints in-process against a fake `ee` module with
+configurable latency, and reports throughput and p50/p95/p99 latency per
+scenario. Results are written as JSON so runs can be compared across commits.
+
+    cd backend
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --ee-latency-ms 200
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<previous>.json
+
+The benchmark database (BENCH_DB_NAME, default geescan_bench) is created if
+missing and its public schema is rebuilt from app/schema.sql for every size.
+The run refuses to start if BENCH_DB_NAME is the app's DB_NAME.
+Connection settings come from the usual DB_HOST/DB_PORT/DB_USER/DB_PASSWORD.
+"""
+import os
+import sys
+import io
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import subprocess
+import contextlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import fake_ee  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+SCHEMA_PATH = os.path.join(BACKEND_DIR, 'app', 'schema.sql')
+
+# Small square polygon used for create requests
+SAMPLE_GEOMETRY = {
+    "type": "Polygon",
+    "coordinates": [[
+        [-74.0060, 40.7128],
+        [-74.0065, 40.7128],
+        [-74.0065, 40.7123],
+        [-74.0060, 40.7123],
+        [-74.0060, 40.7128]
+    ]]
+}
+
+EXPORT_PARAMS = {
+    'start_date': '2024-01-01',
+    'end_date': '2024-01-30',
+    'polarization': ['VV', 'VH'],
+    'orbit': 'ASCENDING'
+}
+
+
+def admin_connection(database):
+    import psycopg2
+    conn = psycopg2.connect(
+        host=os.environ.get('DB_HOST', 'localhost'),
+        port=os.environ.get('DB_PORT', '5432'),
+        database=database,
+        user=os.environ.get('DB_USER'),
+        password=os.environ.get('DB_PASSWORD')
+    )
+    conn.autocommit = True
+    return conn
+
+
+def prepare_database(db_name, size, seed):
+    """Create the benchmark database if needed, rebuild the schema and seed `size` AOIs."""
+    conn = admin_connection('postgres')
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_name,))
+            if cur.fetchone() is None:
+                cur.execute(f'CREATE DATABASE "{db_name}"')
+    finally:
+        conn.close()
+
+    with open(SCHEMA_PATH, 'r') as f:
+        schema_sql = f.read()
+
+    conn = admin_connection(db_name)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DROP SCHEMA IF EXISTS public CASCADE")
+            cur.execute("CREATE SCHEMA public")
+            cur.execute(schema_sql)
+            cur.execute("SELECT setseed(%s)", (seed,))
+            # Random ~1km squares scattered across the globe
+            cur.execute("""
+                INSERT INTO aois (name, description, geometry)
+                SELECT 'Bench AOI ' || i,
+                       'Synthetic benchmark AOI',
+                       ST_MakeEnvelope(x, y, x + 0.01, y + 0.01, 4326)::geography
+                FROM (
+                    SELECT i, -179 + random() * 358 AS x, -79 + random() * 158 AS y
+                    FROM generate_series(1, %s) AS i
+                ) AS points
+            """, (size,))
+            cur.execute("ANALYZE")
+            cur.execute("SELECT min(id), max(id) FROM aois")
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_scenario(flask_app, make_request, iterations, concurrency, seed):
+    """
+    Run `make_request(client, i, rng)` `iterations` times and summarize latencies.
+    Each worker gets its own Random seeded from `seed` and its index, so the
+    requests a worker sends are reproducible at any concurrency.
+    """
+    def worker(w):
+        client = flask_app.test_client()
+        rng = random.Random(f'{seed}:{w}')
+        latencies = []
+        errors = 0
+        for i in range(w, iterations, concurrency):
+            start = time.perf_counter()
+            response = make_request(client, i, rng)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+        return latencies, errors
+
+    start = time.perf_counter()
+    # The app prints debug output on most routes; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            worker_results = list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for worker_latencies, _ in worker_results for latency in worker_latencies)
+    errors = sum(worker_errors for _, worker_errors in worker_results)
+    return {
+        'requests': iterations,
+        'errors': errors,
+        'concurrency': concurrency,
+        'throughput_rps': iterations / elapsed if elapsed else None,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else None,
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+        'p95_ms': percentile(latencies, 95) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None
+    }
+
+
+def build_scenarios(id_range):
+    """Scenario name -> (request function, iteration multiplier)."""
+    min_id, max_id = id_range
+    task_ids = []
+
+    def random_id(rng):
+        return rng.randint(min_id, max_id)
+
+    def aoi_list(client, i, rng):
+        return client.get('/api/aois')
+
+    def aoi_get(client, i, rng):
+        return client.get(f'/api/aois/{random_id(rng)}')
+
+    def aoi_viewport(client, i, rng):
+        lon, lat = rng.uniform(-175, 170), rng.uniform(-75, 70)
+        return client.get(f'/api/aois?bbox={lon},{lat},{lon + 5},{lat + 5}')
+
+    def aoi_point(client, i, rng):
+        return client.get(f'/api/aois/at?lon={rng.uniform(-179, 179)}&lat={rng.uniform(-79, 79)}')
+
+    def aoi_create(client, i, rng):
+        return client.post('/api/aois', json={
+            'name': f'Bench create {i}',
+            'description': 'Created by benchmark',
+            'geometry': SAMPLE_GEOMETRY
+        })
+
+    def aoi_changes_full(client, i, rng):
+        return client.get('/api/aois/changes?since=0')
+
+    def aoi_changes_incremental(client, i, rng):
+        return client.get(f'/api/aois/changes?since={max(max_id - 10, 0)}')
+
+    def export_submit(client, i, rng):
+        response = client.post(f'/api/aois/{random_id(rng)}/export', json=EXPORT_PARAMS)
+        task_id = (response.get_json() or {}).get('task_id')
+        if task_id:
+            task_ids.append(task_id)
+        return response
+
+    def export_consolidated(client, i, rng):
+        aoi_ids = [random_id(rng) for _ in range(10)]
+        return client.post('/api/export/consolidated', json=dict(EXPORT_PARAMS, aoi_ids=aoi_ids))
+
+    def aoi_preview(client, i, rng):
+        # A small pool of AOIs so repeat views exercise the map id cache
+        return client.get(f'/api/aois/{min_id + i % 5}/preview?start_date=2024-01-01&end_date=2024-01-30')
+
+    def export_status(client, i, rng):
+        task_id = task_ids[i % len(task_ids)] if task_ids else 'missing'
+        return client.get(f'/api/export/status/{task_id}')
+
+    return {
+        'aoi_list': (aoi_list, 0.2),
+        'aoi_get': (aoi_get, 1),
+        'aoi_viewport': (aoi_viewport, 1),
+        'aoi_point': (aoi_point, 1),
+        'aoi_create': (aoi_create, 1),
+        'aoi_changes_full': (aoi_changes_full, 0.2),
+        'aoi_changes_incremental': (aoi_changes_incremental, 1),
+        'export_submit': (export_submit, 1),
+        'export_consolidated': (export_consolidated, 0.2),
+        'export_status': (export_status, 1),
+        'aoi_preview': (aoi_preview, 1)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results):
+    for size, scenarios in results.items():
+        print(f"\n{size} AOIs")
+        print(f"  {'scenario':<26}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}  {'ee calls':>8}")
+        for name, stats in scenarios.items():
+            print(f"  {name:<26}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}"
+                  f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['errors']:>8}  {stats['ee_calls']:>8}")
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline_path} (commit {baseline['meta'].get('commit')})")
+    for size, scenarios in results.items():
+        previous = baseline['results'].get(str(size), {})
+        for name, stats in scenarios.items():
+            if name not in previous:
+                continue
+            before, after = previous[name]['p95_ms'], stats['p95_ms']
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"  {size:>7} {name:<26} p95 {before:9.2f} -> {after:9.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GEEScan API against local PostGIS and a fake ee")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="AOI table sizes to seed")
+    parser.add_argument('--iterations', type=int, default=50, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=1, help="concurrent clients per scenario")
+    parser.add_argument('--ee-latency-ms', type=float, default=100.0, help="simulated Earth Engine round trip")
+    parser.add_argument('--scenarios', nargs='+', help="only run these scenarios")
+    parser.add_argument('--seed', type=float, default=0.42, help="seed for synthetic data and request order")
+    parser.add_argument('--output', help="results JSON path (default benchmarks/results/<commit>_<timestamp>.json)")
+    parser.add_argument('--compare', help="previous results JSON to compare p95 latency against")
+    args = parser.parse_args()
+
+    db_name = os.environ.get('BENCH_DB_NAME', 'geescan_bench')
+
+    fake_ee.install(args.ee_latency_ms)
+    # Sampled EXPLAIN re-runs slow statements, which would skew the latency percentiles
+    os.environ['EXPLAIN_SAMPLE_RATE'] = '0'
+
+    import app as app_package
+    # The schema is dropped and rebuilt, so never run against the app's own database
+    from dotenv import dotenv_values
+    app_db_names = {os.environ.get('DB_NAME'), dotenv_values(app_package.env_path).get('DB_NAME')}
+    if db_name in app_db_names:
+        sys.exit(f"BENCH_DB_NAME ({db_name}) is the app database from DB_NAME; "
+                 f"benchmarks drop its schema, so point BENCH_DB_NAME at a separate database")
+    os.environ['DB_NAME'] = db_name  # After app import so .env cannot point us at the real database
+    flask_app = app_package.create_app()
+    from app.api import routes
+    routes.gee_state['initialized'] = True
+
+    results = {}
+    for size in args.sizes:
+        print(f"Seeding {size} AOIs into {db_name}...")
+        id_range = prepare_database(db_name, size, args.seed)
+        fake_ee.reset()
+        scenarios = build_scenarios(id_range)
+        results[size] = {}
+        for name, (make_request, multiplier) in scenarios.items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            iterations = max(1, int(args.iterations * multiplier))
+            calls_before = fake_ee.server_call_count()
+            stats = run_scenario(flask_app, make_request, iterations, args.concurrency, f'{args.seed}:{name}')
+            stats['ee_calls'] = fake_ee.server_call_count() - calls_before
+            results[size][name] = stats
+            print(f"  {name}: {stats['throughput_rps']:.1f} req/s, p95 {stats['p95_ms']:.2f} ms")
+
+    print_results(results)
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{commit or 'nocommit'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'commit': commit,
+                'timestamp': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'sizes': args.sizes,
+                'iterations': args.iterations,
+                'concurrency': args.concurrency,
+                'ee_latency_ms': args.ee_latency_ms,
+                'seed': args.seed
+            },
+            'results': {str(size): scenarios for size, scenarios in results.items()}
+        }, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
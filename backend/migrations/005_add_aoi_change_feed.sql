@@ -0,0 +1,63 @@
+-- Track AOI changes for incremental client sync (GET /api/aois/changes)
+CREATE SEQUENCE IF NOT EXISTS aoi_change_seq;
+
+ALTER TABLE aois ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+
+-- Stamp existing rows in id order so a full sync (since=0) returns them.
+-- update_aois_updated_at is disabled so the backfill keeps each row's updated_at
+ALTER TABLE aois DISABLE TRIGGER update_aois_updated_at;
+
+UPDATE aois
+SET change_seq = stamped.change_seq
+FROM (
+    SELECT id, nextval('aoi_change_seq') AS change_seq
+    FROM (SELECT id FROM aois WHERE change_seq IS NULL ORDER BY id) AS ordered
+) AS stamped
+WHERE aois.id = stamped.id;
+
+ALTER TABLE aois ENABLE TRIGGER update_aois_updated_at;
+
+CREATE INDEX IF NOT EXISTS idx_aois_change_seq ON aois (change_seq);
+
+CREATE TABLE IF NOT EXISTS aoi_tombstones (
+    aoi_id INTEGER PRIMARY KEY,
+    change_seq BIGINT NOT NULL,
+    deleted_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_aoi_tombstones_change_seq ON aoi_tombstones (change_seq);
+
+CREATE OR REPLACE FUNCTION set_aoi_change_seq()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Held until commit so change_seq order matches commit order; otherwise a
+    -- client could sync past a lower seq whose transaction had not committed yet
+    PERFORM pg_advisory_xact_lock(hashtext('aoi_change_seq'));
+    NEW.change_seq = nextval('aoi_change_seq');
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION record_aoi_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('aoi_change_seq'));
+    INSERT INTO aoi_tombstones (aoi_id, change_seq)
+    VALUES (OLD.id, nextval('aoi_change_seq'))
+    ON CONFLICT (aoi_id) DO UPDATE
+        SET change_seq = EXCLUDED.change_seq, deleted_at = CURRENT_TIMESTAMP;
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS set_aois_change_seq ON aois;
+CREATE TRIGGER set_aois_change_seq
+    BEFORE INSERT OR UPDATE ON aois
+    FOR EACH ROW
+    EXECUTE FUNCTION set_aoi_change_seq();
+
+DROP TRIGGER IF EXISTS record_aois_tombstone ON aois;
+CREATE TRIGGER record_aois_tombstone
+    AFTER DELETE ON aois
+    FOR EACH ROW
+    EXECUTE FUNCTION record_aoi_tombstone();
@@ -0,0 +1,19 @@
+-- Record exported GEE assets and the AOIs each one covers (consolidated exports)
+CREATE TABLE IF NOT EXISTS export_assets (
+    id SERIAL PRIMARY KEY,
+    task_id TEXT UNIQUE,
+    asset_id TEXT NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    polarization TEXT[] NOT NULL,
+    orbit TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS export_asset_aois (
+    export_asset_id INTEGER REFERENCES export_assets(id) ON DELETE CASCADE,
+    aoi_id INTEGER REFERENCES aois(id) ON DELETE CASCADE,
+    PRIMARY KEY (export_asset_id, aoi_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_export_asset_aois_aoi_id ON export_asset_aois (aoi_id);
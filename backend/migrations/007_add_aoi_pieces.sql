@@ -0,0 +1,45 @@
+-- Allow MultiPolygon AOIs
+ALTER TABLE aois ALTER COLUMN geometry TYPE GEOGRAPHY(GEOMETRY, 4326);
+ALTER TABLE aois DROP CONSTRAINT IF EXISTS aois_geometry_check;
+ALTER TABLE aois ADD CONSTRAINT aois_geometry_check
+    CHECK (GeometryType(geometry) IN ('POLYGON', 'MULTIPOLYGON'));
+
+-- Subdivided pieces of each AOI so spatial lookups hit small index boxes
+CREATE TABLE IF NOT EXISTS aoi_pieces (
+    id SERIAL PRIMARY KEY,
+    aoi_id INTEGER NOT NULL REFERENCES aois(id) ON DELETE CASCADE,
+    geometry GEOMETRY(GEOMETRY, 4326) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_aoi_pieces_geometry ON aoi_pieces USING GIST (geometry);
+CREATE INDEX IF NOT EXISTS idx_aoi_pieces_aoi_id ON aoi_pieces (aoi_id);
+
+CREATE OR REPLACE FUNCTION rebuild_aoi_pieces()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM aoi_pieces WHERE aoi_id = NEW.id;
+    -- Densify along great circles first, so the planar pieces follow the geodesic edges
+    INSERT INTO aoi_pieces (aoi_id, geometry)
+    SELECT NEW.id, ST_Subdivide(ST_Segmentize(NEW.geometry, 1000)::geometry, 64);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS insert_aois_pieces ON aois;
+CREATE TRIGGER insert_aois_pieces
+    AFTER INSERT ON aois
+    FOR EACH ROW
+    EXECUTE FUNCTION rebuild_aoi_pieces();
+
+DROP TRIGGER IF EXISTS update_aois_pieces ON aois;
+CREATE TRIGGER update_aois_pieces
+    AFTER UPDATE OF geometry ON aois
+    FOR EACH ROW
+    WHEN (ST_AsBinary(OLD.geometry) IS DISTINCT FROM ST_AsBinary(NEW.geometry))
+    EXECUTE FUNCTION rebuild_aoi_pieces();
+
+-- Backfill pieces for existing AOIs
+INSERT INTO aoi_pieces (aoi_id, geometry)
+SELECT id, ST_Subdivide(ST_Segmentize(geometry, 1000)::geometry, 64)
+FROM aois
+WHERE NOT EXISTS (SELECT 1 FROM aoi_pieces WHERE aoi_pieces.aoi_id = aois.id);
@@ -0,0 +1,13 @@
+-- Export geometries simplified per AOI version and export scale
+CREATE TABLE IF NOT EXISTS aoi_simplified (
+    aoi_id INTEGER NOT NULL REFERENCES aois(id) ON DELETE CASCADE,
+    scale DOUBLE PRECISION NOT NULL,
+    change_seq BIGINT NOT NULL,
+    geometry GEOMETRY(GEOMETRY, 4326) NOT NULL,
+    vertices_before INTEGER NOT NULL,
+    vertices_after INTEGER NOT NULL,
+    PRIMARY KEY (aoi_id, scale)
+);
+
+-- Export scale is a request parameter; record it per asset (earlier exports were all 30 m)
+ALTER TABLE export_assets ADD COLUMN IF NOT EXISTS scale DOUBLE PRECISION NOT NULL DEFAULT 30;
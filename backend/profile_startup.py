@@ -0,0 +1,128 @@
+"""
+Startup-time report for the backend.
+
+Imports the app in a fresh interpreter with `-X importtime`, then reports the
+slowest module imports, app import time, create_app time and time to the
+first request served.
+
+    python profile_startup.py                 # print the report
+    python profile_startup.py --budget 1.5    # exit 1 if app startup exceeds 1.5s
+    python profile_startup.py --json          # machine-readable output
+
+The budget covers `import app` plus create_app(), since routes, GEE utils
+and the DB layer are only imported when the blueprint is registered. The
+check also fails if any module in LAZY_MODULES was imported at startup, so
+it doubles as a regression check for cold start.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Heavy dependencies that must only be imported on first use
+LAZY_MODULES = ['ee']
+
+DEFAULT_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', '2.0'))
+
+# Runs in the child interpreter; importtime output goes to stderr, timings to stdout
+CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+response = flask_app.test_client().get('/api/health/api')
+served = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - start,
+    'create_app_s': created - imported,
+    'first_request_s': served - created,
+    'startup_s': created - start,
+    'total_s': served - start,
+    'first_request_status': response.status_code,
+    'lazy_modules_loaded': [m for m in %r if m in sys.modules]
+}))
+""" % (LAZY_MODULES,)
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (module, self_us, cumulative_us) tuples."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_startup():
+    """Profile app startup in a fresh interpreter and return the timings."""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"App startup failed:\n{result.stderr[-2000:]}")
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(result.stderr)
+    timings['modules'] = [
+        {'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+        for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[2], reverse=True)
+    ]
+    return timings
+
+
+def print_report(timings, top=20):
+    print("Startup time report")
+    print(f"  app import:        {timings['import_s'] * 1000:8.1f} ms")
+    print(f"  create_app:        {timings['create_app_s'] * 1000:8.1f} ms")
+    print(f"  startup (budget):  {timings['startup_s'] * 1000:8.1f} ms")
+    print(f"  first request:     {timings['first_request_s'] * 1000:8.1f} ms (status {timings['first_request_status']})")
+    print(f"  total:             {timings['total_s'] * 1000:8.1f} ms")
+    print(f"  lazy modules loaded at startup: {timings['lazy_modules_loaded'] or 'none'}")
+    print()
+    print(f"Top {top} imports by cumulative time")
+    print(f"  {'cumulative ms':>13}  {'self ms':>8}  module")
+    for module in timings['modules'][:top]:
+        print(f"  {module['cumulative_ms']:13.1f}  {module['self_ms']:8.1f}  {module['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report backend startup time")
+    parser.add_argument('--budget', type=float, nargs='?', const=DEFAULT_BUDGET,
+                        help=f"fail if app import plus create_app exceeds this many seconds (default {DEFAULT_BUDGET})")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--top', type=int, default=20, help="number of slowest imports to list")
+    args = parser.parse_args()
+
+    timings = profile_startup()
+    if args.json:
+        print(json.dumps(timings, indent=2))
+    else:
+        print_report(timings, top=args.top)
+
+    if args.budget is not None:
+        failures = []
+        if timings['startup_s'] > args.budget:
+            failures.append(f"app startup took {timings['startup_s']:.3f}s, budget is {args.budget:.3f}s")
+        if timings['lazy_modules_loaded']:
+            failures.append(f"modules that must load lazily were imported at startup: {timings['lazy_modules_loaded']}")
+        if failures:
+            for failure in failures:
+                print(f"FAIL: {failure}", file=sys.stderr)
+            sys.exit(1)
+        print(f"OK: app startup within {args.budget:.3f}s budget", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -70,16 +70,19 @@ function App() {
         };
     };
 
-    // Fetch and load AOIs from the database
+    // Change token from the last sync; '0' requests the full AOI list
+    const syncTokenRef = useRef<string>('0');
+
+    // Fetch AOI changes since the last sync and merge them into the local list
     const loadAois = async () => {
         try {
-            const response = await fetch('http://localhost:5000/api/aois');
+            const response = await fetch(`http://localhost:5000/api/aois/changes?since=${syncTokenRef.current}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             const data = await response.json();
-            if (Array.isArray(data.aois)) {
-                const formattedAois = data.aois.map((aoi: any) => ({
+            if (Array.isArray(data.aois) && Array.isArray(data.deleted)) {
+                const changedAois: AOI[] = data.aois.map((aoi: any) => ({
                     id: aoi.id,
                     name: aoi.name,
                     description: aoi.description,
@@ -89,7 +92,16 @@ function App() {
                     createdAt: aoi.createdAt,
                     updatedAt: aoi.updatedAt,
                 }));
-                setAois(formattedAois);
+                const removedIds = new Set<number>([
+                    ...data.deleted,
+                    ...changedAois.map(aoi => aoi.id)
+                ]);
+                // Newest first, matching the ordering of GET /api/aois
+                setAois(prevAois => [
+                    ...changedAois.reverse(),
+                    ...prevAois.filter(aoi => !removedIds.has(aoi.id))
+                ]);
+                syncTokenRef.current = data.next_token;
             } else {
                 console.error('Unexpected data structure from API:', data);
             }
@@ -150,11 +162,10 @@ function App() {
             const newAoiResponse = await response.json();
 
             if (response.ok) {
-                setAois([...aois, { ...newAoiResponse }]);
                 setSnackbarMessage('AOI created successfully');
                 setSnackbarSeverity('success');
                 setSnackbarOpen(true);
-                loadAois(); // Reload AOIs to reflect changes
+                loadAois(); // Sync AOI changes to reflect the new AOI
             } else {
                 setSnackbarMessage('Failed to save AOI: ' + newAoiResponse.message);
                 setSnackbarSeverity('error');
@@ -290,7 +301,7 @@ function App() {
                 onClose={() => setDrawerOpen(false)}
             >
                 <material.List>
-                    <material.ListItem button key="refresh" onClick={loadAois}>
+                    <material.ListItem button key="refresh" onClick={() => loadAois()}>
                         <material.ListItemIcon><RefreshIcon /></material.ListItemIcon>
                         <material.ListItemText primary="Refresh AOIs" />
                     </material.ListItem>